@@ -1,187 +1,72 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import asyncio
+import io
 import time
-import http.client
-import json
-import re
-import os
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
-# -------------------------------------------------
-# Load environment variables
-# -------------------------------------------------
-load_dotenv()
-
-GEMINI_API_KEY = os.getenv("GEMIAN_PAI_KKEY")  # ensure your .env uses correct spelling
-SERPER_API_KEY = os.getenv("SERPER_API_kEY")
-
-# -------------------------------------------------
-# Helper: Perform search query via Serper API
-# -------------------------------------------------
-def search(query: str):
-    """
-    Performs a Google-like search using Serper.dev API and returns the top 3 organic results.
-    """
-    try:
-        conn = http.client.HTTPSConnection("google.serper.dev")
-        payload = json.dumps({"q": query})
-        headers = {
-            "X-API-KEY": SERPER_API_KEY,
-            "Content-Type": "application/json"
-        }
-        conn.request("POST", "/search", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        response = json.loads(data.decode("utf-8"))
-        results = response.get("organic", [])[:3]
-
-        top_results = [
-            {
-                "title": r.get("title"),
-                "industry": r.get("snippet"),
-                "linkedin": r.get("link"),
-            }
-            for r in results
-        ]
-        return top_results
-
-    except Exception as e:
-        print(f"[ERROR] Search API failed: {e}")
-        return []
+from websearch import cache_stats, create_session, normalize_query, run_pipeline
 
+# How long a fetched company is reused across reruns and sessions
+RESULT_CACHE_TTL = 60 * 60
 
 # -------------------------------------------------
-# Helper: Scrape LinkedIn company page text
+# Helper: Process-wide result cache
 # -------------------------------------------------
-def scrape_linkedin_company_profile(url: str) -> str:
+@st.cache_resource
+def _result_cache() -> dict:
     """
-    Uses Serper.dev scraper endpoint to fetch text from a LinkedIn company profile URL.
+    Returns the shared {normalized query: (fetched_at, result)} store, pruned of
+    expired entries on every fetch. Streamlit reruns the whole
+    script on every widget interaction; this keeps those reruns off Serper and Gemini.
+    (Not st.cache_data: results stream into placeholders created outside the fetch,
+    which Streamlit cannot replay from a cached call.)
     """
-    try:
-        conn = http.client.HTTPSConnection("scrape.serper.dev")
-        payload = json.dumps({"url": url})
-        headers = {
-            "X-API-KEY": SERPER_API_KEY,
-            "Content-Type": "application/json"
-        }
-        conn.request("POST", "/", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        json_data = json.loads(data.decode("utf-8"))
-        return json_data.get("text", "")
-
-    except Exception as e:
-        print(f"[ERROR] Scraping failed for {url}: {e}")
-        return ""
+    return {}
 
 
 # -------------------------------------------------
-# Helper: Extract JSON block from Markdown text
+# Helper: Run all queries through the pipeline
 # -------------------------------------------------
-def extract_json_from_markdown(text: str):
+async def fetch_all(queries, on_result=None):
     """
-    Extracts JSON object enclosed in a ```json ... ``` block.
+    Runs every query through the search -> scrape -> Gemini pipeline over one
+    pooled HTTP session, reusing results fetched within RESULT_CACHE_TTL.
+    on_result(index, result) fires as each query finishes. Results keep the input order.
     """
-    match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if not match:
-        print("[WARN] No JSON block found in model output.")
-        return None
-
-    try:
-        return json.loads(match.group(1))
-    except json.JSONDecodeError as e:
-        print(f"[ERROR] JSON decode failed: {e}")
-        return None
-
-
-# -------------------------------------------------
-# Core: Extract structured data from LinkedIn profile
-# -------------------------------------------------
-def extract_data_in_json(query: str, model: str = "gemini-2.5-flash", thinking_budget: int = 0):
-    """
-    Given a company name or query, searches LinkedIn, scrapes data,
-    and extracts structured company info in JSON format using Gemini.
-    """
-    results = search(query)
-    if not results:
-        return {"error": "No search results found."}
-
-    top_result = results[0]
-    linkedin_url = top_result.get("linkedin", "")
-    title = top_result.get("title", "")
-    industry = top_result.get("industry", "")
-
-    # Fetch company content
-    context = scrape_linkedin_company_profile(linkedin_url)
-    print(f"[INFO] Extracting company data from: {linkedin_url}")
-
-    # Initialize Gemini client
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    config = types.GenerateContentConfig(
-        thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget)
-    )
-
-    # Define structured extraction prompt
-    system_prompt = f"""
-You are a precise and structured information extractor.
-
-Given the following context about a company, extract and return the information in JSON format with these fields:
-
-- company_name
-- industry_type
-- funding
-- founding_stage
-- number_of_employees
-- location
-- company_description
-- type_of_company (private or public)
-
-If any field is not mentioned, return "Not available" for that field.
-
-Context:
-{context}
-
-Title: {title}
-Industry: {industry}
-
-Output format (strict JSON):
-{{
-  "company_name": "",
-  "industry_type": "",
-  "funding": "",
-  "founding_stage": "",
-  "number_of_employees": "",
-  "location": "",
-  "company_description": "",
-  "type_of_company": ""
-}}
-"""
-
-    try:
-        response = client.models.generate_content(
-            model=model,
-            contents=system_prompt,
-            config=config,
-        )
-        text_out = response.candidates[0].content.parts[0].text
-        json_data = extract_json_from_markdown(text_out)
-
-        if json_data:
-            json_data["linkedin_url"] = linkedin_url
+    cache = _result_cache()
+    now = time.time()
+    # Drop expired entries so the process-wide store stays bounded by the TTL
+    # (snapshot the items: other sessions' threads may write concurrently)
+    for key in [k for k, (fetched_at, _) in list(cache.items()) if now - fetched_at >= RESULT_CACHE_TTL]:
+        cache.pop(key, None)
+
+    keys = [normalize_query(q) for q in queries]
+    results = [None] * len(queries)
+    pending = []
+    for i, key in enumerate(keys):
+        hit = cache.get(key)
+        if hit:
+            results[i] = hit[1]
+            if on_result:
+                on_result(i, hit[1])
         else:
-            json_data = {"error": "Failed to parse JSON output", "linkedin_url": linkedin_url}
-
-        return json_data
-
-    except Exception as e:
-        print(f"[ERROR] Gemini extraction failed: {e}")
-        return {"error": str(e)}
+            pending.append(i)
 
+    def done(j, result):
+        i = pending[j]
+        results[i] = result
+        if "error" not in result and "Error" not in result:
+            cache[keys[i]] = (time.time(), result)
+        if on_result:
+            on_result(i, result)
 
+    if pending:
+        async with create_session() as session:
+            await run_pipeline(session, [queries[i] for i in pending], done)
+    return results
 
 
 # ------------------ STREAMLIT APP ------------------ #
@@ -208,34 +93,42 @@ if st.button("Fetch Company Data"):
     if not queries:
         st.warning("⚠️ Please enter at least one company name or query.")
     else:
-        st.info("🔍 Searching... please wait a few seconds per query.")
+        st.info("🔍 Searching... please wait a few seconds.")
         
-        results = []
-        for query in queries:
-            with st.spinner(f"Fetching info for: {query}"):
-                try:
-                    data = extract_data_in_json(query)  # Your function should return a dict
-                    results.append(data)
-                except Exception as e:
-                    results.append({"company_name": query, "Error": str(e)})
-                time.sleep(2)  # polite delay between requests
+        # Rows appear as each company finishes, not when the whole batch is done
+        table = st.empty()
+        rows = [None] * len(queries)
+
+        def on_result(i, result):
+            rows[i] = result
+            table.dataframe(pd.DataFrame([r for r in rows if r is not None]))
+
+        with st.spinner(f"Fetching info for {len(queries)} queries..."):
+            results = asyncio.run(fetch_all(queries, on_result))
         
-        # Convert to DataFrame
-        df = pd.DataFrame(results)
+        # Convert to a columnar Arrow table (union of keys: error rows lack most fields).
+        # Values are stored as strings: rows parsed from the markdown fallback are not
+        # schema-constrained, so one column can mix ints and strings.
+        columns = list(dict.fromkeys(key for r in results for key in r))
+        arrow_table = pa.Table.from_pydict(
+            {c: [None if r.get(c) is None else str(r.get(c)) for r in results] for c in columns},
+            schema=pa.schema([(c, pa.string()) for c in columns]),
+        )
+        df = arrow_table.to_pandas()
         
         st.success("✅ Data fetched successfully!")
         
-        # Show DataFrame
-        st.dataframe(df)
-
-        # Add clickable LinkedIn URL (if present)
-        def make_clickable(link):
-            if pd.notna(link) and link.startswith("http"):
-                return f'<a href="{link}" target="_blank">View LinkedIn</a>'
-            return "Not available"
-        
+        # Show table (Streamlit ships Arrow tables to the browser as-is)
+        table.dataframe(arrow_table)
+
+        # Add clickable LinkedIn URL (if present), built column-wise instead of per row
         if "linkedin_url" in df.columns:
-            df["LinkedIn Profile"] = df["linkedin_url"].apply(make_clickable)
+            links = df["linkedin_url"].fillna("").astype(str)
+            df["LinkedIn Profile"] = np.where(
+                links.str.startswith("http"),
+                '<a href="' + links + '" target="_blank">View LinkedIn</a>',
+                "Not available",
+            )
             st.markdown(
                 df[["company_name", "industry_type", "funding", 
                     "founding_stage", "number_of_employees", 
@@ -244,8 +137,10 @@ if st.button("Fetch Company Data"):
                 unsafe_allow_html=True
             )
         
-        # Save CSV
-        csv = df.to_csv(index=False)
+        # Save CSV (written by Arrow's C++ writer, from the fetched columns only)
+        buffer = io.BytesIO()
+        pacsv.write_csv(arrow_table, buffer)
+        csv = buffer.getvalue()
         st.download_button(
             label="📥 Download Results as CSV",
             data=csv,
@@ -253,3 +148,9 @@ if st.button("Fetch Company Data"):
             mime="text/csv"
         )
 
+# Cache stats (Serper search/scrape + Gemini extraction)
+stats = cache_stats()
+st.sidebar.subheader("🗄️ Response cache")
+st.sidebar.metric("Cache hits", stats["hits"])
+st.sidebar.metric("Cache misses", stats["misses"])
+st.sidebar.caption(f"{stats['entries']} cached entries")
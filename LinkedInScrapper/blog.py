@@ -1,6 +1,11 @@
 import streamlit as st
+import asyncio
 import json
 import os
+import re
+import time
+import uuid
+from functools import lru_cache
 from datetime import datetime
 from typing import List, Dict
 from dotenv import load_dotenv
@@ -15,18 +20,20 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMIAN_PAI_KKEY")  # ensure your .env uses correct spelling
 model = "gemini-2.5-flash"  # or gemini-1.5-pro
+MAX_CONCURRENCY = 5  # parallel Gemini calls, keep under the RPM quota
+ARTICLE_CACHE_TTL = 24 * 60 * 60  # reuse a generated article for the same title/details for a day
+
+# Shared generation config (built once, not per article)
+_GENAI_CONFIG = types.GenerateContentConfig(
+    thinking_config=types.ThinkingConfig(thinking_budget=0)
+)
 
 # Virtual blog folder
 BLOG_DIR = "blog"
 os.makedirs(BLOG_DIR, exist_ok=True)
 
 # === GEMINI BLOG GENERATION FUNCTION ===
-def generate_blog_article(title: str, details: str = "") -> str:
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    config = types.GenerateContentConfig(
-        thinking_config=types.ThinkingConfig(thinking_budget=0)
-    )
-
+async def generate_blog_article_async(client: genai.Client, title: str, details: str = "", on_text=None) -> str:
     system_prompt = f"""
 You are an expert programming blogger. Write a complete, high-quality blog post in Markdown.
 
@@ -48,40 +55,97 @@ Begin now.
 """
 
     try:
-        response = client.models.generate_content(
+        # Stream chunks so the article renders as it is written; on_text gets the text so far
+        stream = await client.aio.models.generate_content_stream(
             model=model,
             contents=system_prompt,
-            config=config,
+            config=_GENAI_CONFIG,
         )
-        text_out = response.candidates[0].content.parts[0].text
+        text_out = ""
+        async for chunk in stream:
+            text_out += chunk.text or ""
+            if on_text:
+                on_text(text_out)
         return text_out
 
     except Exception as e:
         print(f"[ERROR] Gemini extraction failed: {e}")
         return {"error": str(e)}
 
+# === ARTICLE CACHE ===
+@st.cache_resource
+def _article_cache() -> Dict:
+    # Process-wide {(title, details): (created_at, content, filepath)}. Not st.cache_data:
+    # generation streams into placeholders created outside, which cached functions can't replay.
+    return {}
+
 # === SAVE ARTICLE ===
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w -]")  # \w = letters, digits, underscore
+
+@lru_cache(maxsize=256)
+def _safe_name(title: str) -> str:
+    return _UNSAFE_FILENAME_CHARS.sub("_", title)[:60]
+
 def save_article(title: str, content: str) -> str:
-    safe_name = "".join(c if c.isalnum() or c in " _-" else "_" for c in title)[:60]
+    safe_name = _safe_name(title)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{BLOG_DIR}/{safe_name}_{timestamp}.md"
+    # Short random suffix: articles now finish in parallel and can share title + second
+    filename = f"{BLOG_DIR}/{safe_name}_{timestamp}_{uuid.uuid4().hex[:6]}.md"
     with open(filename, "w", encoding="utf-8") as f:
         f.write(str(content))
     return filename
 
 # === ZIP HELPER ===
-def create_zip(folder):
+def create_zip(folder) -> bytes:
+    # Built in memory only; Markdown deflates well, so the download is much smaller
     buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w") as zf:
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
         for root, _, files in os.walk(folder):
             for file in files:
                 zf.write(os.path.join(root, file), file)
-    buffer.seek(0)
-    zip_path = f"{folder}.zip"
-    with open(zip_path, "wb") as f:
-        f.write(buffer.getvalue())
     return buffer.getvalue()
 
+# === PARALLEL GENERATION ===
+async def _gather_all(lines: List[str], on_done, on_text=None) -> List[Dict]:
+    """Generate and save every article concurrently; on_done(n_done, result) fires as each finishes,
+    on_text(index, text_so_far) as each article streams in."""
+    client = genai.Client(api_key=GEMINI_API_KEY)
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+
+    async def one(i: int, line: str) -> Dict:
+        title = line.split("|")[0].strip()
+        details = line.split("|")[1].strip() if "|" in line else ""
+
+        # Repeat clicks within ARTICLE_CACHE_TTL reuse the saved article instead of re-hitting Gemini
+        cached = _article_cache().get((title, details))
+        if cached and time.time() - cached[0] < ARTICLE_CACHE_TTL and os.path.exists(cached[2]):
+            _, content, filepath = cached
+            if on_text:
+                on_text(i, content)
+        else:
+            async with sem:
+                content = await generate_blog_article_async(
+                    client, title, details, on_text=(lambda text: on_text(i, text)) if on_text else None
+                )
+            # Keep disk I/O off the event loop
+            filepath = await loop.run_in_executor(None, save_article, title, content)
+            if isinstance(content, str):
+                _article_cache()[(title, details)] = (time.time(), content, filepath)
+
+        return {
+            "title": title,
+            "file": filepath,
+            "preview": content[:500] + "..." if len(content) > 500 else content
+        }
+
+    results = []
+    for fut in asyncio.as_completed([one(i, line) for i, line in enumerate(lines)]):
+        result = await fut
+        results.append(result)
+        on_done(len(results), result)
+    return results
+
 # === STREAMLIT UI ===
 st.title("AI Programming Blog Generator")
 st.markdown("Generate **10 articles** instantly using **Gemini**")
@@ -111,6 +175,8 @@ user_input = st.text_area(
 # --- Persist generated results ---
 if "generated_articles" not in st.session_state:
     st.session_state.generated_articles = []
+if "zip_bytes" not in st.session_state:
+    st.session_state.zip_bytes = None
 
 # === GENERATE ARTICLES ===
 if st.button("Generate All Articles", type="primary"):
@@ -121,52 +187,53 @@ if st.button("Generate All Articles", type="primary"):
     else:
         progress = st.progress(0)
         status = st.empty()
-        results = []
-
-        for i, line in enumerate(lines):
-            status.text(f"Generating {i+1}/{len(lines)}: {line.split('|')[0]}...")
+        status.text(f"Generating {len(lines)} articles...")
 
-            title = line.split("|")[0].strip()
-            details = line.split("|")[1].strip() if "|" in line else ""
+        def on_done(done: int, result: Dict):
+            # Advances in completion order, not title order
+            status.text(f"Generated {done}/{len(lines)}: {result['title']}")
+            progress.progress(done / len(lines))
 
-            content = generate_blog_article(title, details)
-            filepath = save_article(title, content)
+        # One live placeholder per article, filled token-by-token while it streams
+        live = []
+        for line in lines:
+            with st.expander(line.split("|")[0].strip()):
+                live.append(st.empty())
 
-            results.append({
-                "title": title,
-                "file": filepath,
-                "preview": content[:500] + "..." if len(content) > 500 else content
-            })
+        def on_text(i: int, text: str):
+            live[i].markdown(text)
 
-            progress.progress((i + 1) / len(lines))
+        results = asyncio.run(_gather_all(lines, on_done, on_text))
 
         status.success(f"Generated {len(results)} articles in `{BLOG_DIR}/`")
         st.session_state.generated_articles = results
+        st.session_state.zip_bytes = create_zip(BLOG_DIR)
 
 # === DISPLAY RESULTS ===
 if st.session_state.generated_articles:
     st.subheader("Generated Articles")
 
-    for r in st.session_state.generated_articles:
+    # Widget keys include the row index: repeated titles can share a cached file
+    for i, r in enumerate(st.session_state.generated_articles):
         with st.expander(f"**{r['title']}** → `{os.path.basename(r['file'])}`"):
             st.code(r['preview'])
-            if st.button("View Full", key=f"view_{r['file']}"):
-                st.session_state[f"show_full_{r['file']}"] = True
+            if st.button("View Full", key=f"view_{i}_{r['file']}"):
+                st.session_state[f"show_full_{i}_{r['file']}"] = True
 
     # === FULL PREVIEW ===
-    for r in st.session_state.generated_articles:
-        if st.session_state.get(f"show_full_{r['file']}"):
+    for i, r in enumerate(st.session_state.generated_articles):
+        if st.session_state.get(f"show_full_{i}_{r['file']}"):
             st.markdown(f"---\n**Full Article: {r['title']}**")
             with open(r['file'], "r", encoding="utf-8") as f:
                 st.markdown(f.read())
-            if st.button("Hide Full", key=f"hide_{r['file']}"):
-                st.session_state[f"show_full_{r['file']}"] = False
+            if st.button("Hide Full", key=f"hide_{i}_{r['file']}"):
+                st.session_state[f"show_full_{i}_{r['file']}"] = False
             st.markdown("---")
 
     # === DOWNLOAD ALL ===
     st.download_button(
         "Download All as ZIP",
-        data=open(f"{BLOG_DIR}.zip", "rb") if os.path.exists(f"{BLOG_DIR}.zip") else create_zip(BLOG_DIR),
+        data=st.session_state.zip_bytes or create_zip(BLOG_DIR),
         file_name=f"programming_blog_{datetime.now().strftime('%Y%m%d')}.zip",
         mime="application/zip"
     )
@@ -1,10 +1,21 @@
-import http.client
-import json
+import aiohttp
+import asyncio
+import functools
+import hashlib
+import orjson
 import re
 import os
+import time
+import unicodedata
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from aiolimiter import AsyncLimiter
+from diskcache import Cache
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
+from pydantic import BaseModel
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 # -------------------------------------------------
 # Load environment variables
@@ -15,160 +26,461 @@ GEMINI_API_KEY = os.getenv("GEMIAN_PAI_KKEY")  # ensure your .env uses correct s
 SERPER_API_KEY = os.getenv("SERPER_API_kEY")
 
 # -------------------------------------------------
-# Helper: Perform search query via Serper API
+# Shared HTTP session (keep-alive + connection pooling)
 # -------------------------------------------------
-def search(query: str):
+def create_session() -> aiohttp.ClientSession:
     """
-    Performs a Google-like search using Serper.dev API and returns the top 3 organic results.
+    Builds one pooled aiohttp session to be shared by every Serper request in a batch,
+    so back-to-back calls reuse open TLS connections instead of re-handshaking.
+    Must be created (and closed) inside the running event loop.
     """
+    connector = aiohttp.TCPConnector(limit=32, limit_per_host=16, ttl_dns_cache=300)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=15))
+
+# -------------------------------------------------
+# Persistent cache for Serper + Gemini responses
+# -------------------------------------------------
+CACHE_DIR = os.path.join(".cache", "serper")
+SERPER_CACHE_TTL = 24 * 60 * 60      # search / scrape results: 24 h
+GEMINI_CACHE_TTL = 7 * 24 * 60 * 60  # extraction output (thinking_budget=0): 7 d
+
+_CACHE = Cache(CACHE_DIR)
+_CACHE.stats(enable=True)
+
+# diskcache is blocking SQLite I/O; run it on worker threads so the event loop
+# keeps serving other in-flight requests (Cache is thread-safe)
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cache-io")
+
+
+async def _cache_get(key: str):
+    return await asyncio.get_running_loop().run_in_executor(_IO_EXECUTOR, _CACHE.get, key)
+
+
+async def _cache_set(key: str, value, expire: int) -> None:
+    await asyncio.get_running_loop().run_in_executor(
+        _IO_EXECUTOR, functools.partial(_CACHE.set, key, value, expire=expire)
+    )
+
+
+def _cache_key(fn: str, model: str, value: str) -> str:
+    """
+    Builds a stable cache key from the function name, model and normalized input.
+    """
+    return hashlib.blake2b(f"{fn}:{model}:{value}".encode("utf-8")).hexdigest()
+
+
+def cache_stats() -> dict:
+    """
+    Returns cache hit/miss counters and entry count (for display in the UI).
+    """
+    hits, misses = _CACHE.stats()
+    return {"hits": hits, "misses": misses, "entries": len(_CACHE)}
+
+# -------------------------------------------------
+# Rate limiting + retries (per host)
+# -------------------------------------------------
+SERPER_RATE = (100, 60)  # (max_rate, time_period in s): google/scrape.serper.dev
+GEMINI_RATE = (60, 60)   # (max_rate, time_period in s): generativelanguage.googleapis.com
+RETRYABLE_STATUS = (429, 503)
+
+# AsyncLimiter keeps futures bound to the loop it runs on, and the Streamlit handler
+# starts a fresh loop per click, so keep one pair of limiters per loop.
+_LIMITERS = weakref.WeakKeyDictionary()
+
+# Set from Serper's X-RateLimit-* headers once the quota is used up; shared across
+# loops so an exhausted quota is still respected on the next click
+_serper_paused_until = 0.0
+
+
+def _get_limiters() -> dict:
+    """
+    Returns the {"serper", "gemini"} limiters for the running event loop, creating them on first use.
+    """
+    loop = asyncio.get_running_loop()
+    limiters = _LIMITERS.get(loop)
+    if limiters is None:
+        limiters = _LIMITERS[loop] = {
+            "serper": AsyncLimiter(*SERPER_RATE),
+            "gemini": AsyncLimiter(*GEMINI_RATE),
+        }
+    return limiters
+
+
+def _is_retryable(e: BaseException) -> bool:
+    # aiohttp errors carry .status, google-genai APIError carries .code
+    return getattr(e, "status", None) in RETRYABLE_STATUS or getattr(e, "code", None) in RETRYABLE_STATUS
+
+
+_retry_on_throttle = retry(
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    retry=retry_if_exception(_is_retryable),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+
+
+def _update_serper_rate_limit(headers) -> None:
+    """
+    Pauses further Serper calls until the window resets when the response
+    reports no quota left (X-RateLimit-Remaining / X-RateLimit-Reset).
+    """
+    global _serper_paused_until
     try:
-        conn = http.client.HTTPSConnection("google.serper.dev")
-        payload = json.dumps({"q": query})
-        headers = {
-            "X-API-KEY": SERPER_API_KEY,
-            "Content-Type": "application/json"
+        remaining = int(headers["X-RateLimit-Remaining"])
+        reset = float(headers["X-RateLimit-Reset"])
+    except (KeyError, ValueError):
+        return
+    if remaining > 0:
+        return
+    # Reset is either an epoch timestamp or seconds until reset
+    wait = reset - time.time() if reset > 1e9 else reset
+    _serper_paused_until = max(_serper_paused_until, time.monotonic() + max(wait, 0))
+
+
+@_retry_on_throttle
+async def _serper_post(session: aiohttp.ClientSession, url: str, payload):
+    """
+    POSTs a JSON payload to a Serper endpoint under the per-host limiter and
+    returns the decoded response. Retries with exponential backoff on 429/503.
+    """
+    delay = _serper_paused_until - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+    headers = {
+        "X-API-KEY": SERPER_API_KEY,
+        "Content-Type": "application/json"
+    }
+    async with _get_limiters()["serper"]:
+        async with session.post(url, data=orjson.dumps(payload), headers=headers) as res:
+            _update_serper_rate_limit(res.headers)
+            res.raise_for_status()
+            return orjson.loads(await res.read())
+
+
+@_retry_on_throttle
+async def _gemini_generate(model: str, contents: str, config: types.GenerateContentConfig):
+    """
+    Calls Gemini under the per-host limiter, retrying with exponential backoff on 429/503.
+    """
+    async with _get_limiters()["gemini"]:
+        return await get_genai_client().aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
+        )
+
+# -------------------------------------------------
+# Helper: Perform search queries via Serper API (batched)
+# -------------------------------------------------
+# Serper accepts up to 100 queries per batch request
+SERPER_BATCH_SIZE = 100
+
+
+def _top_results(response: dict):
+    """
+    Maps one Serper search response to the top 3 organic results.
+    """
+    return [
+        {
+            "title": r.get("title"),
+            "industry": r.get("snippet"),
+            "linkedin": r.get("link"),
         }
-        conn.request("POST", "/search", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        response = json.loads(data.decode("utf-8"))
-        results = response.get("organic", [])[:3]
-
-        top_results = [
-            {
-                "title": r.get("title"),
-                "industry": r.get("snippet"),
-                "linkedin": r.get("link"),
-            }
-            for r in results
-        ]
-        return top_results
+        for r in response.get("organic", [])[:3]
+    ]
 
-    except Exception as e:
-        print(f"[ERROR] Search API failed: {e}")
-        return []
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query ("Stripe" / " stripe " / full-width "ＳＴＲＩＰＥ"),
+    shared by the search cache key and pipeline deduplication.
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+
+async def search_batch(session: aiohttp.ClientSession, queries: list[str]) -> list[list[dict]]:
+    """
+    Performs Google-like searches for many queries using Serper.dev's batch API
+    (one POST per SERPER_BATCH_SIZE queries) and returns the top 3 organic results
+    for each query, in input order. Results are cached on disk for SERPER_CACHE_TTL,
+    keyed on the normalized query; only cache misses are sent to Serper.
+    """
+    keys = [_cache_key("search", "serper", normalize_query(q)) for q in queries]
+    results = await asyncio.gather(*[_cache_get(key) for key in keys])
+    pending = [i for i, cached in enumerate(results) if cached is None]
+
+    for start in range(0, len(pending), SERPER_BATCH_SIZE):
+        chunk = pending[start:start + SERPER_BATCH_SIZE]
+        try:
+            payload = [{"q": queries[i]} for i in chunk]
+            responses = await _serper_post(session, "https://google.serper.dev/search", payload)
+            for i, response in zip(chunk, responses):
+                top_results = _top_results(response)
+                if top_results:
+                    await _cache_set(keys[i], top_results, SERPER_CACHE_TTL)
+                results[i] = top_results
+
+        except Exception as e:
+            print(f"[ERROR] Search API failed: {e}")
+
+    return [r or [] for r in results]
+
+
+async def search(session: aiohttp.ClientSession, query: str):
+    """
+    Performs a Google-like search using Serper.dev API and returns the top 3 organic results.
+    """
+    return (await search_batch(session, [query]))[0]
 
 
 # -------------------------------------------------
 # Helper: Scrape LinkedIn company page text
 # -------------------------------------------------
-def scrape_linkedin_company_profile(url: str) -> str:
+async def scrape_linkedin_company_profile(session: aiohttp.ClientSession, url: str) -> str:
     """
     Uses Serper.dev scraper endpoint to fetch text from a LinkedIn company profile URL.
+    Page text is cached on disk for SERPER_CACHE_TTL, keyed on the URL.
     """
-    try:
-        conn = http.client.HTTPSConnection("scrape.serper.dev")
-        payload = json.dumps({"url": url})
-        headers = {
-            "X-API-KEY": SERPER_API_KEY,
-            "Content-Type": "application/json"
-        }
-        conn.request("POST", "/", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
+    key = _cache_key("scrape", "serper", url.strip().lower())
+    cached = await _cache_get(key)
+    if cached is not None:
+        return cached
 
-        json_data = json.loads(data.decode("utf-8"))
-        return json_data.get("text", "")
+    try:
+        json_data = await _serper_post(session, "https://scrape.serper.dev/", {"url": url})
+        text = json_data.get("text", "")
+        if text:
+            await _cache_set(key, text, SERPER_CACHE_TTL)
+        return text
 
     except Exception as e:
         print(f"[ERROR] Scraping failed for {url}: {e}")
         return ""
 
 
+# -------------------------------------------------
+# Helper: Trim scraped LinkedIn text before prompting
+# -------------------------------------------------
+# Keywords marking one of the extracted fields. Compiled once, reused per call.
+_LINKEDIN_FIELD_RE = re.compile(
+    r'\b(?:industry|headquarters|company size|founded|funding|type|specialties|employees|stage)\b',
+    re.I,
+)
+DISTILL_HEAD_CHARS = 500     # leading company description, kept verbatim
+DISTILL_WINDOW_BEFORE = 100  # context kept before each keyword
+DISTILL_WINDOW_AFTER = 200   # context kept after it (LinkedIn puts the value after its label)
+DISTILL_MIN_CHARS = 200      # below this the matched snippets are not trusted
+
+
+def distill_linkedin_text(text: str) -> str:
+    """
+    Reduces a scraped LinkedIn page to its leading description plus a window of
+    text around each field keyword, to cut Gemini input tokens.
+    Works on a page scraped as a single long line as well as on line-broken text.
+    Falls back to the full text if too little is matched.
+    """
+    windows = []
+    for m in _LINKEDIN_FIELD_RE.finditer(text, DISTILL_HEAD_CHARS):
+        start = max(m.start() - DISTILL_WINDOW_BEFORE, DISTILL_HEAD_CHARS)
+        end = m.end() + DISTILL_WINDOW_AFTER
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)  # merge overlapping windows
+        else:
+            windows.append([start, end])
+
+    snippets = [text[start:end].strip() for start, end in windows]
+    if len("\n".join(snippets)) < DISTILL_MIN_CHARS:
+        return text
+    return "\n".join([text[:DISTILL_HEAD_CHARS], *snippets])
+
+
+# -------------------------------------------------
+# Schema: Structured output returned by Gemini
+# -------------------------------------------------
+class CompanyInfo(BaseModel):
+    company_name: str
+    industry_type: str
+    funding: str
+    founding_stage: str
+    number_of_employees: str
+    location: str
+    company_description: str
+    type_of_company: str
+
+
+# -------------------------------------------------
+# Shared Gemini client + config
+# -------------------------------------------------
+# Static part of the extraction prompt, sent as system_instruction; only the company
+# context varies per call. (~100 tokens: too small for Gemini context caching.)
+EXTRACTION_INSTRUCTION = """
+You are a precise and structured information extractor.
+
+Given the following context about a company, extract the information for these fields:
+
+- company_name
+- industry_type
+- funding
+- founding_stage
+- number_of_employees
+- location
+- company_description
+- type_of_company (private or public)
+
+If any field is not mentioned, return "Not available" for that field.
+"""
+
+_GENAI_CONFIG = types.GenerateContentConfig(
+    system_instruction=EXTRACTION_INSTRUCTION,
+    response_mime_type="application/json",
+    response_schema=CompanyInfo,
+    thinking_config=types.ThinkingConfig(thinking_budget=0)
+)
+
+# The client's async HTTP pool is bound to the event loop that first uses it, and the
+# Streamlit handler starts a fresh loop per click, so keep one client per loop.
+_GENAI_CLIENTS = weakref.WeakKeyDictionary()
+
+
+def get_genai_client() -> genai.Client:
+    """
+    Returns the Gemini client for the running event loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _GENAI_CLIENTS.get(loop)
+    if client is None:
+        client = _GENAI_CLIENTS[loop] = genai.Client(api_key=GEMINI_API_KEY)
+    return client
+
+
 # -------------------------------------------------
 # Helper: Extract JSON block from Markdown text
 # -------------------------------------------------
+_JSON_FENCE = "```json"
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+
+
+def _loads_json_object(block: str):
+    """
+    Parses a JSON object, with one repair attempt for trailing commas before } or ].
+    Returns None if the block is not a JSON object.
+    """
+    try:
+        data = orjson.loads(block)
+    except orjson.JSONDecodeError:
+        try:
+            data = orjson.loads(_TRAILING_COMMA_RE.sub(r"\1", block))
+        except orjson.JSONDecodeError:
+            return None
+    return data if isinstance(data, dict) else None
+
+
 def extract_json_from_markdown(text: str):
     """
     Extracts JSON object enclosed in a ```json ... ``` block.
+    Only used as a fallback when the model ignores the response schema.
+    Locates the fences with str.find (linear per fence, no regex backtracking);
+    each later ``` is tried as the closing fence in turn, since a JSON string
+    value may itself contain ```.
     """
-    match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if not match:
+    start = text.find(_JSON_FENCE)
+    if start == -1:
         print("[WARN] No JSON block found in model output.")
         return None
 
+    body_start = start + len(_JSON_FENCE)
+    end = text.find("```", body_start)
+    while end != -1:
+        data = _loads_json_object(text[body_start:end].strip())
+        if data is not None:
+            return data
+        end = text.find("```", end + 3)
+
+    print("[ERROR] JSON decode failed: no parseable object in ```json block.")
+    return None
+
+
+def parse_model_json(text: str):
+    """
+    Parses model output that did not come back as response.parsed (e.g. it failed
+    schema validation). In JSON mode the body is bare JSON, so try that first and
+    only fall back to scanning for a ```json fence.
+    """
     try:
-        return json.loads(match.group(1))
-    except json.JSONDecodeError as e:
-        print(f"[ERROR] JSON decode failed: {e}")
-        return None
+        data = orjson.loads(text)
+        if isinstance(data, dict):
+            return data
+    except orjson.JSONDecodeError:
+        pass
+    return extract_json_from_markdown(text)
 
 
 # -------------------------------------------------
 # Core: Extract structured data from LinkedIn profile
 # -------------------------------------------------
-def extract_data_in_json(query: str, model: str = "gemini-2.5-flash", thinking_budget: int = 0):
+async def extract_data_in_json(session: aiohttp.ClientSession, query: str, model: str = "gemini-2.5-flash", thinking_budget: int = 0):
     """
     Given a company name or query, searches LinkedIn, scrapes data,
     and extracts structured company info in JSON format using Gemini.
+    Coroutine: run many of these concurrently with asyncio.gather, sharing one session.
+    """
+    results = await search(session, query)
+    return await extract_from_search_results(session, results, model, thinking_budget)
+
+
+async def extract_from_search_results(session: aiohttp.ClientSession, results: list[dict], model: str = "gemini-2.5-flash", thinking_budget: int = 0):
+    """
+    Scrapes the top search result's LinkedIn page and extracts structured
+    company info in JSON format using Gemini. Use after search_batch.
     """
-    results = search(query)
     if not results:
         return {"error": "No search results found."}
 
     top_result = results[0]
-    linkedin_url = top_result.get("linkedin", "")
-    title = top_result.get("title", "")
-    industry = top_result.get("industry", "")
 
     # Fetch company content
-    context = scrape_linkedin_company_profile(linkedin_url)
-    print(f"[INFO] Extracting company data from: {linkedin_url}")
+    context = await scrape_linkedin_company_profile(session, top_result.get("linkedin", ""))
+    return await extract_company_info(top_result, context, model, thinking_budget)
 
-    # Initialize Gemini client
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    config = types.GenerateContentConfig(
-        thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget)
-    )
-
-    # Define structured extraction prompt
-    system_prompt = f"""
-You are a precise and structured information extractor.
 
-Given the following context about a company, extract and return the information in JSON format with these fields:
-
-- company_name
-- industry_type
-- funding
-- founding_stage
-- number_of_employees
-- location
-- company_description
-- type_of_company (private or public)
+async def extract_company_info(top_result: dict, context: str, model: str = "gemini-2.5-flash", thinking_budget: int = 0):
+    """
+    Extracts structured company info in JSON format using Gemini, from a search
+    result and the scraped text of its LinkedIn page.
+    """
+    linkedin_url = top_result.get("linkedin", "")
+    title = top_result.get("title", "")
+    industry = top_result.get("industry", "")
+    print(f"[INFO] Extracting company data from: {linkedin_url}")
 
-If any field is not mentioned, return "Not available" for that field.
+    config = _GENAI_CONFIG
+    if thinking_budget != 0:
+        config = config.model_copy(update={"thinking_config": types.ThinkingConfig(thinking_budget=thinking_budget)})
 
+    # Variable part of the prompt; the instruction lives in EXTRACTION_INSTRUCTION
+    contents = f"""
 Context:
-{context}
+{distill_linkedin_text(context)}
 
 Title: {title}
 Industry: {industry}
-
-Output format (strict JSON):
-{{
-  "company_name": "",
-  "industry_type": "",
-  "funding": "",
-  "founding_stage": "",
-  "number_of_employees": "",
-  "location": "",
-  "company_description": "",
-  "type_of_company": ""
-}}
 """
 
+    # Same prompt + model => same extraction; skip Gemini on a cache hit
+    gemini_key = _cache_key("extract", f"{model}:{thinking_budget}", EXTRACTION_INSTRUCTION + contents)
+    cached = await _cache_get(gemini_key)
+    if cached is not None:
+        return cached
+
     try:
-        response = client.models.generate_content(
-            model=model,
-            contents=system_prompt,
-            config=config,
-        )
-        text_out = response.candidates[0].content.parts[0].text
-        json_data = extract_json_from_markdown(text_out)
+        response = await _gemini_generate(model, contents, config)
+        # The SDK parses the schema-constrained JSON for us
+        json_data = response.parsed.model_dump() if response.parsed else parse_model_json(response.text or "")
 
         if json_data:
             json_data["linkedin_url"] = linkedin_url
+            await _cache_set(gemini_key, json_data, GEMINI_CACHE_TTL)
         else:
             json_data = {"error": "Failed to parse JSON output", "linkedin_url": linkedin_url}
 
@@ -179,3 +491,122 @@ Output format (strict JSON):
         return {"error": str(e)}
 
 
+# -------------------------------------------------
+# Core: Staged pipeline (search -> scrape -> Gemini)
+# -------------------------------------------------
+# Workers per stage, sized to each API's rate limit
+SEARCH_WORKERS = 16
+SCRAPE_WORKERS = 8
+LLM_WORKERS = 4
+# Queries per search batch fed into the pipeline; small enough that
+# scraping starts before the whole input has been searched
+PIPELINE_SEARCH_CHUNK = 10
+
+
+async def run_pipeline(session: aiohttp.ClientSession, queries: list[str], on_result=None, model: str = "gemini-2.5-flash", thinking_budget: int = 0):
+    """
+    Looks up every query through three queue-connected stages so that searching,
+    scraping and Gemini extraction for different queries overlap.
+    Duplicate queries are searched once, and queries resolving to the same
+    LinkedIn URL are scraped and extracted once.
+    on_result(index, result) fires as soon as each query finishes.
+    Returns the results in input order.
+    """
+    results = [None] * len(queries)
+    q_search, q_scrape, q_llm = asyncio.Queue(), asyncio.Queue(), asyncio.Queue()
+
+    # Unique (normalized) queries -> positions in the input
+    positions = {}
+    for i, query in enumerate(queries):
+        positions.setdefault(normalize_query(query), []).append(i)
+    unique = list(positions)
+    first_query = [queries[positions[key][0]] for key in unique]
+
+    # Resolved LinkedIn URL -> unique queries waiting on it, and finished URLs
+    url_to_queries = {}
+    url_results = {}
+
+    def finish(u, result):
+        for i in positions[unique[u]]:
+            results[i] = dict(result)
+            if on_result:
+                on_result(i, results[i])
+
+    def fail(u, e):
+        finish(u, {"company_name": first_query[u], "Error": str(e)})
+
+    def finish_url(url, result):
+        url_results[url] = result
+        for u in url_to_queries.pop(url):
+            finish(u, result)
+
+    def fail_url(url, e):
+        for u in url_to_queries.pop(url):
+            fail(u, e)
+
+    async def search_worker():
+        while True:
+            chunk = await q_search.get()
+            try:
+                found = await search_batch(session, [first_query[u] for u in chunk])
+                for u, top_results in zip(chunk, found):
+                    if not top_results:
+                        finish(u, {"error": "No search results found."})
+                        continue
+                    url = top_results[0].get("linkedin", "")
+                    if url in url_results:
+                        finish(u, url_results[url])
+                    elif url in url_to_queries:
+                        url_to_queries[url].append(u)
+                    else:
+                        url_to_queries[url] = [u]
+                        q_scrape.put_nowait((url, top_results[0]))
+            except Exception as e:
+                for u in chunk:
+                    fail(u, e)
+            finally:
+                q_search.task_done()
+
+    async def scrape_worker():
+        while True:
+            url, top_result = await q_scrape.get()
+            try:
+                context = await scrape_linkedin_company_profile(session, url)
+                q_llm.put_nowait((url, top_result, context))
+            except Exception as e:
+                fail_url(url, e)
+            finally:
+                q_scrape.task_done()
+
+    async def llm_worker():
+        while True:
+            url, top_result, context = await q_llm.get()
+            try:
+                result = await extract_company_info(top_result, context, model, thinking_budget)
+            except Exception as e:
+                fail_url(url, e)
+            else:
+                finish_url(url, result)
+            finally:
+                q_llm.task_done()
+
+    for start in range(0, len(unique), PIPELINE_SEARCH_CHUNK):
+        q_search.put_nowait(list(range(start, min(start + PIPELINE_SEARCH_CHUNK, len(unique)))))
+
+    workers = (
+        [asyncio.create_task(search_worker()) for _ in range(SEARCH_WORKERS)]
+        + [asyncio.create_task(scrape_worker()) for _ in range(SCRAPE_WORKERS)]
+        + [asyncio.create_task(llm_worker()) for _ in range(LLM_WORKERS)]
+    )
+    try:
+        # Each stage only enqueues downstream before marking its item done,
+        # so joining in order waits for every item to clear all three stages
+        await q_search.join()
+        await q_scrape.join()
+        await q_llm.join()
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    return results